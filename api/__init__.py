@@ -1,4 +1,5 @@
-from . import exceptions, handler, models, parsers, sess, utils
+from . import cache, exceptions, handler, models, parsers, sess, utils
+from .cache import TTLCache
 from .exceptions import *
 from .handler import APIHandler
 from .parsers import LegacySearchParser, ParserError, PostParser
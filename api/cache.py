@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """A small in-memory LRU cache whose entries expire after `ttl` seconds.
+
+    Parameters:
+        ttl (`float`): Number of seconds each entry is kept in the cache.
+        maxsize (`int`, optional): Maximum number of entries to keep. When the cache
+        is full, the least recently used entry is evicted.
+
+    Expiry is checked lazily using a monotonic clock when an entry is read, so
+    the cache doesn't need any background task to clean itself up.
+    """
+
+    __slots__ = ("_ttl", "_maxsize", "_data")
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be a positive number")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}"
+            f"(ttl={self._ttl!r}, maxsize={self._maxsize!r}, size={len(self._data)})"
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def ttl(self) -> float:
+        """Number of seconds each entry is kept in the cache."""
+        return self._ttl
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the value stored for `key` or `default` if it's missing or expired."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store `value` for `key` and evict the least recently used entry if the cache is full."""
+        self._data[key] = (monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove the entry stored for `key` and return its value (or `default`)."""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        self._data.clear()
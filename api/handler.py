@@ -1,32 +1,81 @@
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+import asyncio
+from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
+from pydantic import parse_obj_as
+
 if TYPE_CHECKING:
+    from httpx import AsyncClient
+
     from .models import PostDownloadPage
 
-from .exceptions import BadRequestError
+from .cache import TTLCache
+from .exceptions import BadRequestError, NotFoundError
 from .models import Comment, LegacySearchItem
 from .parsers import LegacySearchParser, PostParser
 from .sess import Session
-from .utils import render_content
+
+
+@lru_cache(maxsize=1024)
+def _search_endpoint(query: str, page: Optional[int], per_page: Optional[int]) -> str:
+    """Build the endpoint of the farsroid `JSON` search API for the given parameters."""
+    params = [("search", query)]
+    # only add the optional params that are actually set
+    if page:
+        params.append(("page", page))
+    if per_page:
+        params.append(("per_page", per_page))
+    return "/wp-json/wp/v2/search?" + urlencode(params)
+
+
+@lru_cache(maxsize=1024)
+def _stats_endpoint(ids: Tuple[int, ...]) -> str:
+    """Build the endpoint of the farsroid statistics API for the given post IDs."""
+    return f"/api/posts/?ids={','.join(map(str, ids))}"
 
 
 class APIHandler:
     """An API handler for interacting with the farsroid endpoints and parsing the results.
 
     Parameters:
-        html_parser (`str`, optional): The HTML parser to use (`lxml`, `html.parser`, etc.).
-        
-    * html parser will be used to parse the HTML of a page and convert it to a :class:`bs4.BeautifulSoup` object.
+        html_parser (`str`, optional): The :class:`bs4.BeautifulSoup` parser (`lxml`, `html.parser`, etc.)
+        of the underlying session, see :meth:`Session.get_soup <api.sess.Session.get_soup>`. Defaults to `lxml`.
+        cache_ttl (`float`, optional): Number of seconds to cache the `JSON` API responses
+        (search, statistics, comments) for. Caching is disabled by default.
+        client (:class:`httpx.AsyncClient`, optional): A client to send the requests with
+        (created with ``base_url=Session.BASE_URL``). By default the application-wide
+        shared client is used (see :func:`~api.sess.get_default_client`).
+        concurrency (`int`, optional): Maximum number of requests sent to `farsroid.com`
+        at the same time, 10 to 20 avoids getting rate limited. Defaults to 12.
+
+    * The pages are always parsed into :mod:`lxml` documents for the parsers, html parser
+      only affects the soups returned by :meth:`Session.get_soup <api.sess.Session.get_soup>`.
 
     Attributes:
         _sess (:class:`Session`): The :class:`~api.sess.Session` object used to send requests.
     """
 
-    __slots__ = ("_sess",)
+    STATS_CHUNK_SIZE: ClassVar[int] = 50
+    """Maximum number of post IDs to get statistics for in a single request."""
+    POST_CACHE_SIZE: ClassVar[int] = 256
+    """Maximum number of parsed posts kept for revalidation by :meth:`get_post`."""
+    POST_CACHE_TTL: ClassVar[float] = 24 * 60 * 60
+    """Number of seconds a parsed post is kept for revalidation by :meth:`get_post`."""
 
-    def __init__(self, html_parser: Optional[str] = None) -> None:
-        self._sess = Session(html_parser)
+    __slots__ = ("_sess", "_posts")
+
+    def __init__(
+            self,
+            html_parser: str = Session.DEFAULT_HTML_PARSER,
+            cache_ttl: Optional[float] = None,
+            client: Optional["AsyncClient"] = None,
+            concurrency: int = Session.DEFAULT_CONCURRENCY
+    ) -> None:
+        self._sess = Session(html_parser, cache_ttl=cache_ttl, client=client, concurrency=concurrency)
+        # post ID -> (response validators, parsed post)
+        self._posts = TTLCache(self.POST_CACHE_TTL, maxsize=self.POST_CACHE_SIZE)
 
     def __enter__(self) -> "APIHandler":
         return self
@@ -63,7 +112,7 @@ class APIHandler:
         """
         page_num = page or 1
         endpoint = f"page/{page_num}/?s={query}" if page_num > 1 else f"?s={query}"
-        parser = LegacySearchParser(await self._sess.get_soup(endpoint))
+        parser = LegacySearchParser(await self._sess.get_html(endpoint))
         return parser.parsed(), parser.total_pages
 
     async def search(
@@ -84,10 +133,38 @@ class APIHandler:
             the total number of available pages for the search query if `legacy` mode is enabled 
             or a list of :class:`Dict[str, Any]` objects if not using the legacy search.
         """
-        params = {"search": query, "page": page, "per_page": per_page}
-        # make sure to remove None values from params
-        endpoint = f"/wp-json/wp/v2/search?{urlencode({k: v for k, v in params.items() if v})}"
-        return await self._sess.get_json(endpoint)
+        return await self._sess.get_json(_search_endpoint(query, page, per_page))
+
+    async def search_with_stats(
+            self,
+            query: str,
+            page: Optional[int] = None,
+            per_page: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for posts and get the statistics of the found posts in one call.
+
+        Parameters:
+            query (`str`): The query to search for.
+            page (`int`, optional): The page number to fetch.
+            per_page (`int`, optional): The number of results per page.
+
+        Returns:
+            A list of the search results (see :meth:`search`), each one with an extra
+            `statistics` key holding the post's statistics (or `None` if not available).
+
+        * The statistics of all the found posts are requested right after the search
+          response is decoded using a single (or chunked) statistics request.
+        """
+        results = await self.search(query, page, per_page)
+        if not results:
+            return []
+        try:
+            stats = await self.get_post_statistics([item["id"] for item in results])
+        except (BadRequestError, NotFoundError):
+            # farsroid API returns 400 if the posts are not found.
+            stats = {}
+        stats_by_id = {item["post_id"]: item for item in stats.get("data") or []}
+        return [{**item, "statistics": stats_by_id.get(item["id"])} for item in results]
 
     async def get_post_statistics(self, post_id: Union[int, List[int]]) -> Dict[str, Any]:
         """Get statistics for a post (application)
@@ -97,10 +174,21 @@ class APIHandler:
 
         Returns:
             `Dict[str, Any]`: A dictionary of post statistics.
+
+        * Lists longer than :attr:`STATS_CHUNK_SIZE` are split into chunks which are
+          requested concurrently (bounded by the session's concurrency limit) and
+          their `data` entries are merged into a single dictionary.
         """
-        ids = post_id if isinstance(post_id, list) else [post_id]
-        endpoint = f"/api/posts/?ids={','.join(map(str, ids))}"
-        return await self._sess.get_json(endpoint)
+        ids = tuple(post_id) if isinstance(post_id, list) else (post_id,)
+        if len(ids) <= self.STATS_CHUNK_SIZE:
+            return await self._sess.get_json(_stats_endpoint(ids))
+
+        results = await asyncio.gather(*(
+            self._sess.get_json(_stats_endpoint(ids[i:i + self.STATS_CHUNK_SIZE]))
+            for i in range(0, len(ids), self.STATS_CHUNK_SIZE)
+        ))
+        # build a new dictionary since the chunk results may be cached by the session
+        return {**results[0], "data": [item for res in results for item in res.get("data") or []]}
 
     async def get_comments_by(self, by: str, _id: int, **kwargs) -> List["Comment"]:
         """Get comments by post id, parent id or comment id.
@@ -118,23 +206,20 @@ class APIHandler:
         if not isinstance(_id, int):
             raise BadRequestError("Invalid data type for `id`", 400)
 
-        query = urlencode({by: _id, **{k: v for k, v in kwargs.items() if v}})
+        # enum members (e.g. the comments order) are sent by their values
+        query = urlencode([
+            (by, _id),
+            *((k, v.value if isinstance(v, Enum) else v) for k, v in kwargs.items() if v)
+        ])
         endpoint = "/wp-json/wp/v2/comments"
 
         endpoint += f"?{query}" if by != "comment" else f"/{_id}"
-        comments: List[Dict[str, Any]] = await self._sess.get_json(endpoint)
-        return [
-            Comment(
-                comment_id=comment["id"],
-                post_id=comment["post"],
-                parent_id=comment["parent"],
-                content=render_content(comment["content"]["rendered"]),
-                link=comment["link"],
-                date=comment["date"],
-                author=comment["author_name"]
-            )
-            for comment in comments
-        ]
+        comments: Union[Dict[str, Any], List[Dict[str, Any]]] = await self._sess.get_json(endpoint)
+        if isinstance(comments, dict):
+            # a single comment is returned when getting comments `by` comment ID
+            comments = [comments]
+        # validate the whole payload at once instead of building each comment by hand
+        return parse_obj_as(List[Comment], comments)
 
     async def get_post(self, post_id: int) -> "PostDownloadPage":
         """Get a post's download page data from `farsroid.com` by its ID.
@@ -144,7 +229,18 @@ class APIHandler:
 
         Returns:
             A :class:`PostDownloadPage` object containing data like the post's title, download links, etc.
+
+        * Parsed posts are kept along with the `ETag`/`Last-Modified` headers of their page,
+          the next request of the same post is sent as a conditional request and the
+          page is only downloaded and parsed again if it has changed.
         """
-        post_soup = await self._sess.get_soup(f"/?p={post_id}")
-        parser = PostParser(post_soup)
-        return parser.post_obj()
+        validators, post = self._posts.get(post_id, (None, None))
+        post_tree, new_validators = await self._sess.get_html_if_modified(f"/?p={post_id}", validators)
+        if post_tree is None:
+            # not modified since the cached response
+            self._posts.set(post_id, (validators, post))
+            return post
+        post = PostParser(post_tree).post_obj()
+        if new_validators:
+            self._posts.set(post_id, (new_validators, post))
+        return post
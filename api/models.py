@@ -1,10 +1,58 @@
-from typing import Dict, List, Optional
+from typing import Any, Callable, ClassVar, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, root_validator, validator
+
+from .utils import render_content
+
+
+class PlainHttpUrl(str):
+    """An `http` or `https` URL that is kept as a plain string.
+
+    Validation only checks the scheme and the host of the URL with :func:`urllib.parse.urlsplit`,
+    which is much cheaper than the regex based :class:`pydantic.HttpUrl` validator and
+    matters for pages with many media, related posts and download links.
+    """
+
+    max_length: ClassVar[int] = 2083
+    """Maximum length of the URL (the same limit as :class:`pydantic.HttpUrl`)."""
+
+    @classmethod
+    def __get_validators__(cls) -> Iterator[Callable[[Any], str]]:
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]) -> None:
+        field_schema.update(type="string", format="uri", minLength=1, maxLength=cls.max_length)
+
+    @classmethod
+    def validate(cls, value: Any) -> str:
+        if not isinstance(value, str):
+            raise TypeError("string required")
+        if len(value) > cls.max_length:
+            raise ValueError(f"URL must be at most {cls.max_length} characters long")
+        parts = urlsplit(value)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError("invalid or missing URL scheme or host")
+        return value
+
+
+WP_COMMENT_FIELDS: Dict[str, str] = {
+    "id": "comment_id",
+    "post": "post_id",
+    "parent": "parent_id",
+    "author_name": "author",
+}
+"""Mapping of WordPress comments API field names to the :class:`Comment` field names."""
 
 
 class Comment(BaseModel):
-    """Represents a comment on a post."""
+    """Represents a comment on a post.
+
+    Comments can be validated straight from the WordPress comments API payload;
+    its field names are mapped using :data:`WP_COMMENT_FIELDS` and the
+    rendered HTML `content` is converted to plain text.
+    """
     comment_id: int = Field(
         ...,
         title="Comment ID",
@@ -23,7 +71,7 @@ class Comment(BaseModel):
         description="The content of the comment in plain text.",
         example="This is a comment.",
     )
-    link: HttpUrl = Field(
+    link: PlainHttpUrl = Field(
         ...,
         title="Link",
         description="The link to the comment on that post.",
@@ -48,6 +96,22 @@ class Comment(BaseModel):
         example=1837937
     )
 
+    @root_validator(pre=True)
+    def map_api_fields(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Map the WordPress comments API field names to the model field names."""
+        values = dict(values)
+        for api_name, field_name in WP_COMMENT_FIELDS.items():
+            if api_name in values and field_name not in values:
+                values[field_name] = values.pop(api_name)
+        return values
+
+    @validator("content", pre=True)
+    def render_html_content(cls, value: Any) -> Any:
+        """Convert the `{"rendered": "<html>"}` content of the API to plain text."""
+        if isinstance(value, dict):
+            return render_content(value.get("rendered", ""))
+        return value
+
 
 class DownloadData(BaseModel):
     """Represents the data to download a file from a URL."""
@@ -57,7 +121,7 @@ class DownloadData(BaseModel):
         description="The title of the download link.",
         example="دانلود فایل نصبی اصلی بازی با لینک مستقیم- 177 مگابایت"
     )
-    url: HttpUrl = Field(
+    url: PlainHttpUrl = Field(
         ...,
         title="URL",
         description="The URL to download the file from.",
@@ -67,7 +131,7 @@ class DownloadData(BaseModel):
 
 class PostMedia(BaseModel):
     """Represents a post's media (video, etc.)."""
-    url: HttpUrl = Field(
+    url: PlainHttpUrl = Field(
         ...,
         title="URL",
         description="The URL to the media.",
@@ -95,13 +159,13 @@ class RelatedPost(BaseModel):
         description="The title of the related post.",
         example="Asphalt 8 Airborne"
     )
-    url: HttpUrl = Field(
+    url: PlainHttpUrl = Field(
         ...,
         title="URL",
         description="The URL to the related post.",
         example="https://www.farsroid.com/?p=12355"
     )
-    thumbnail: HttpUrl = Field(
+    thumbnail: PlainHttpUrl = Field(
         ...,
         title="Thumbnail URL",
         description="The URL to the thumbnail of the related post.",
@@ -132,7 +196,7 @@ class PostDownloadPage(BaseModel):
             "(پول بی نهایت) به صورت جداگانه تست شده با اجرای بدون مشکل پیشنهاد ویژه"
         )
     )
-    post_url: HttpUrl = Field(
+    post_url: PlainHttpUrl = Field(
         ...,
         title="Post URL",
         description="The URL of the post on the site.",
@@ -183,7 +247,7 @@ class PostDownloadPage(BaseModel):
             "thumbnail": "https://www.farsroid.com/wp-content/uploads/Asphalt-8-Airborne-logo-3-1.jpg"
         }
     )
-    gplay_url: Optional[HttpUrl] = Field(
+    gplay_url: Optional[PlainHttpUrl] = Field(
         None,
         title="Google Play URL",
         description="The URL to the post on Google Play.",
@@ -199,7 +263,7 @@ class LegacySearchItem(BaseModel):
         description="The ID of the post.",
         example=10555,
     )
-    url: HttpUrl = Field(
+    url: PlainHttpUrl = Field(
         ...,
         title="URL",
         description="The URL to the post.",
@@ -210,7 +274,7 @@ class LegacySearchItem(BaseModel):
         title="Title",
         description="The title of the post."
     )
-    thumbnail: HttpUrl = Field(
+    thumbnail: PlainHttpUrl = Field(
         ...,
         title="Thumbnail URL",
         description="The URL to the thumbnail of the post."
@@ -1,8 +1,9 @@
 import re
-from abc import ABC, abstractmethod
-from typing import Any, Dict, Iterator, List, Optional
+from functools import cached_property, lru_cache
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml.html import HtmlElement
 
 from .exceptions import NotFoundError
 from .models import (
@@ -23,65 +24,182 @@ METADATA_NAMES: List[str] = [
 """A list of metadata names that may be present in the `meta` field of response."""
 
 
-def _parse_post_meta_search(post: Any) -> Optional[Dict[str, Any]]:
+def _has_class(name: str) -> str:
+    """Return an XPath predicate that matches elements having `name` in their `class` attribute."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _href_ends_with(*exts: str) -> str:
+    """Return an XPath predicate that matches elements whose `href` ends with one of `exts`."""
+    # XPath 1.0 has no 'ends-with' function, so the tail of the href is compared instead.
+    return " or ".join(
+        f"substring(@href, string-length(@href) - {len(ext) - 1}) = '{ext}'" for ext in exts
+    )
+
+
+def _href_contains(*exts: str) -> str:
+    """Return an XPath predicate that matches elements whose `href` contains one of `exts`."""
+    return " or ".join(f"contains(@href, '{ext}')" for ext in exts)
+
+
+_SCREENSHOT_EXTS = (".jpg", ".png")
+"""File extensions of the screenshots in a post's gallery."""
+_VIDEO_EXTS = (".mp4", ".webm")
+"""File extensions of the videos in a post's gallery."""
+_DL_EXTS = (".apk", ".zip", ".obb", ".rar")
+"""File extensions of the download links of a post."""
+_RELATED_POST_RE = re.compile(r"post-\d+")
+"""Matches the `post-<id>` class of the related posts' articles."""
+_DIGITS_RE = re.compile(r"\d+")
+"""Matches the first number (post IDs, page numbers, etc.) in a text."""
+_VERSION_RE = re.compile(r"\d+(?:\.\d+)*")
+"""Matches a version number (e.g. `6.1.0`) in a post's title."""
+_STRIP_NL = str.maketrans("", "", "\n")
+"""Translation table that removes the newlines of a text."""
+_STRIP_COMMAS = str.maketrans("", "", ",")
+"""Translation table that removes the thousands separators of a number."""
+
+# The top-level sections of a post page, as (name, XPath predicate) pairs.
+_PAGE_SECTIONS = (
+    # id must be starting with 'post-' and followed by a number.
+    ("article", "self::article[starts-with(@id, 'post-') and string-length(@id) > 5"
+                " and translate(substring(@id, 6), '0123456789', '') = '']"),
+    ("title", "self::title"),
+    ("sidebar", f"self::aside[{_has_class('sidebar-single')}]"),
+    ("gallery", f"self::section[{_has_class('screenshots-gallery')}]"),
+    ("related_posts", f"self::section[{_has_class('related-posts')}]"),
+    ("gplay_link", f"self::*[{_has_class('gply-link')}]"),
+    ("download_box", f"self::*[{_has_class('download-links')}]"),
+)
+
+# XPath expressions are compiled once and evaluated by libxml2 on every post page...
+# The sections are collected in a single walk over the document with one predicate
+# (a '|' union of the section paths would walk the document once per branch).
+_PAGE_SECTIONS_XP = etree.XPath(f"//*[{' or '.join(pred for _, pred in _PAGE_SECTIONS)}]")
+_PAGE_SECTION_TESTS = tuple((name, etree.XPath(f"boolean({pred})")) for name, pred in _PAGE_SECTIONS)
+_POST_CONTENT_XP = etree.XPath(f".//div[{_has_class('post-content')}]")
+_THUMBNAIL_IMG_XP = etree.XPath(f".//*[{_has_class('post-thumbnail')}]//img")
+_GAME_MODE_XP = etree.XPath(f".//*[{_has_class('game-mode')}]")
+_INFO_DIVS_XP = etree.XPath(f".//div[{_has_class('inf-cnt')}]")
+_POST_CLASS_TAGS_XP = etree.XPath(".//*[contains(@class, 'post-')]")
+_MEDIA_LINKS_XP = etree.XPath(f".//*[{_href_contains(*_SCREENSHOT_EXTS, *_VIDEO_EXTS)}]")
+_SCREENSHOT_LINKS_XP = etree.XPath(f".//*[{_href_ends_with(*_SCREENSHOT_EXTS)}]")
+_VIDEO_LINKS_XP = etree.XPath(f".//*[{_href_ends_with(*_VIDEO_EXTS)}]")
+_DL_LINKS_XP = etree.XPath(f".//*[{_href_ends_with(*_DL_EXTS)}]")
+
+# ... and these ones on every legacy search page.
+_SEARCH_ITEMS_XP = etree.XPath(f"//*[{_has_class('post-item-wide')}]")
+_PAGE_NUMBERS_XP = etree.XPath(f"//*[{_has_class('page-numbers')}]")
+_BOOKMARK_BTN_XP = etree.XPath(f".//a[{_has_class('bookmark-btn')}]")
+_FARSROID_LINK_XP = etree.XPath(".//a[contains(@href, 'farsroid.com')]")
+_H2_XP = etree.XPath(".//h2")
+_IMG_XP = etree.XPath(".//img")
+_SPAN_XP = etree.XPath(".//span")
+_EXCERPT_XP = etree.XPath(f".//*[{_has_class('excerpt')}]")
+
+
+# (persian word, metadata name) pairs, checked in order against the label of each info tag.
+_SEARCH_META_KEYS = (("اندروید", "required_android_version"), ("نسخه", "version"))
+_POST_META_KEYS = (("اندروید", "required_android_version"), ("دسته بندی", "category"))
+
+
+@lru_cache(maxsize=128)
+def _meta_key(label: str, keys: Tuple[Tuple[str, str], ...]) -> str:
+    """Return the metadata name of a persian info label (or an empty string if it's unknown).
+
+    The site only uses a handful of labels, so after the first pages every
+    label is resolved with a single cache lookup.
+    """
+    for word, name in keys:
+        if word in label:
+            return name
+    return ""
+
+
+def _first(nodes: List[Any]) -> Optional[Any]:
+    """Return the first node of an XPath result or `None` if nothing was matched."""
+    return nodes[0] if nodes else None
+
+
+def _find_sections(tree: HtmlElement) -> Dict[str, HtmlElement]:
+    """Return the first element of each section in :data:`_PAGE_SECTIONS` found in a post page."""
+    sections = {}
+    for node in _PAGE_SECTIONS_XP(tree):
+        for name, test in _PAGE_SECTION_TESTS:
+            if name not in sections and test(node):
+                sections[name] = node
+    return sections
+
+
+def _get_text(element: HtmlElement, separator: str = " ") -> str:
+    """Return the stripped text pieces of an element joined by `separator`.
+
+    This is the :mod:`lxml` equivalent of ``Tag.get_text(strip=True, separator=separator)``.
+    """
+    return separator.join(text.strip() for text in element.itertext() if text.strip())
+
+
+def _parse_post_meta_search(post: HtmlElement) -> Optional[Dict[str, Any]]:
     """Parse a post metadata from the search result."""
-    info_tags = post.find_all(class_="inf-cnt")
+    info_tags = _INFO_DIVS_XP(post)
     if not info_tags:
         return
     meta = {}
     for info_tag in info_tags:
-        key = info_tag.find("span").text
-        value = info_tag.text.replace(key, "").strip()
-        if "اندروید" in key:
-            key = "required_android_version"
-        elif "نسخه" in key:
-            key = "version"
-        else:
-            key = ""
+        label = _first(_SPAN_XP(info_tag)).text_content()
+        value = info_tag.text_content().replace(label, "").strip()
+        key = _meta_key(label, _SEARCH_META_KEYS)
         if key and value:
             meta[key] = value
     return meta
 
 
-def _parse_post_search_result(post: Any) -> Dict[str, Any]:
+def _parse_post_search_result(post: HtmlElement) -> Dict[str, Any]:
     """Parse a post content from the search result."""
-    bookmark_btn = post.find("a", class_="bookmark-btn")
+    bookmark_btn = _first(_BOOKMARK_BTN_XP(post))
     data = {
-        "url": post.find("a", href=lambda href: href and "farsroid.com" in href).get("href"),
-        "title": post.find("h2").text.replace("\n", ""),
-        "thumbnail": post.find("img").get("data-src"),
-        "description": post.find(class_="excerpt").get_text(strip=True, separator=" "),
+        "url": _first(_FARSROID_LINK_XP(post)).get("href"),
+        "title": _first(_H2_XP(post)).text_content().translate(_STRIP_NL),
+        "thumbnail": _first(_IMG_XP(post)).get("data-src"),
+        "description": _get_text(_first(_EXCERPT_XP(post))),
         "meta": _parse_post_meta_search(post),
     }
-    if bookmark_btn and bookmark_btn.get("data-id"):
-        post_id = by_pattern(r"\d+", bookmark_btn.get("data-id"))
+    if bookmark_btn is not None and bookmark_btn.get("data-id"):
+        post_id = by_pattern(_DIGITS_RE, bookmark_btn.get("data-id"))
         data["post_id"] = int(post_id) if post_id else None
     return data
 
 
 class ParserError(Exception):
-    """Base error class for all API :class:`bs4.BeautifulSoup` response parsers' error."""
+    """Base error class for all API response parsers' error."""
 
     def __init__(self, message: str, *args) -> None:
         super().__init__(message, *args)
 
 
-class BaseParser(ABC):
-    """Base class for all parsers."""
+class BaseParser:
+    """Base class for all parsers.
+
+    Subclasses may declare a different type of parsed document they work on
+    with :attr:`TREE_TYPE` (:class:`lxml.html.HtmlElement` by default).
+    """
+
+    TREE_TYPE: ClassVar[type] = HtmlElement
+    """Type of the parsed document that the parser must be initialized with."""
 
-    __slots__ = ("_soup",)
+    __slots__ = ("_tree",)
 
-    def __init__(self, soup_obj: "BeautifulSoup") -> None:
-        if not isinstance(soup_obj, BeautifulSoup):
+    def __init__(self, tree: Any) -> None:
+        if not isinstance(tree, self.TREE_TYPE):
             raise ParserError(
-                "Parser must be initialized with a BeautifulSoup object "
-                f"not {type(soup_obj)}"
+                f"{self.__class__.__name__} must be initialized with a "
+                f"{self.TREE_TYPE.__name__} object not {type(tree)}"
             )
-        self._soup = soup_obj
+        self._tree = tree
 
-    @abstractmethod
     def parsed(self) -> Any:
-        ...
+        """Return the parsed data (must be implemented by subclasses)."""
+        raise NotImplementedError
 
     def __getitem__(self, key: str) -> Any:
         if not isinstance(key, str):
@@ -97,65 +215,66 @@ class BaseParser(ABC):
         return self[key] is not None
 
     @property
-    def soup(self) -> "BeautifulSoup":
-        """Return the :class:`bs4.BeautifulSoup` object used to parse the data."""
-        return self._soup
+    def tree(self) -> Any:
+        """Return the parsed document (an instance of :attr:`TREE_TYPE`) used to parse the data."""
+        return self._tree
 
 
 class LegacySearchParser(BaseParser):
     """A parser for searches that were made with `legacy` mode.
 
     Parameters:
-        search_soup (:class:`bs4.BeautifulSoup`): The :class:`bs4.BeautifulSoup` 
-        object return by :class:`~handler.APIHandler` class from web response.
+        search_tree (:class:`lxml.html.HtmlElement`): The parsed HTML document of
+        the search page retrieved from the API (see :meth:`~api.sess.Session.get_html`).
     """
 
-    def __init__(self, search_soup: "BeautifulSoup") -> None:
-        super().__init__(search_soup)
+    def __init__(self, search_tree: HtmlElement) -> None:
+        super().__init__(search_tree)
 
     @property
     def total_pages(self) -> int:
         """Total number of pages available in search result."""
-        page_numbers = self._soup.find_all(class_="page-numbers")
+        page_numbers = _PAGE_NUMBERS_XP(self._tree)
         if page_numbers and len(page_numbers) > 1:
-            last_page = by_pattern(r"\d+", page_numbers[-1].text.replace(",", ""))
+            last_page = by_pattern(_DIGITS_RE, page_numbers[-1].text_content().translate(_STRIP_COMMAS))
             return int(last_page) if last_page else 1
         return 1
 
-    def iter_posts(self) -> Optional[Iterator[Dict[str, Any]]]:
+    def iter_posts(self) -> Iterator[Dict[str, Any]]:
         """Iterate over the posts found in the search result."""
-        posts = self._soup.find_all(class_="post-item-wide")
-        if not posts:
-            return
-        for post in posts:
+        for post in _SEARCH_ITEMS_XP(self._tree):
             yield _parse_post_search_result(post)
 
     def parsed(self) -> List[LegacySearchItem]:
         """Return a list of :class:`~api.models.LegacySearchItem` objects from the search result."""
-        return [LegacySearchItem(**post) for post in self.iter_posts()]
+        return [LegacySearchItem(**_parse_post_search_result(post)) for post in _SEARCH_ITEMS_XP(self._tree)]
 
 
 class PostParser(BaseParser):
-    """Parse a post's download page data from its :class:`bs4.BeautifulSoup` object.
+    """Parse a post's download page data from its :class:`lxml.html.HtmlElement` document.
 
     Parameters:
-        app_soup (:class:`bs4.BeautifulSoup`): The :class:`bs4.BeautifulSoup` 
-        object of the post retrieved from the API.
+        app_tree (:class:`lxml.html.HtmlElement`): The parsed HTML document
+        of the post retrieved from the API (see :meth:`~api.sess.Session.get_html`).
+
+    Elements are located with precompiled XPath expressions, so the whole
+    page is walked by libxml2 instead of :class:`bs4.BeautifulSoup` tag objects.
+    Each parsed property is computed once and then cached on the parser.
     """
 
-    __slots__ = ("_main_content", "_sidebar")
+    # '__dict__' holds the values of the cached properties.
+    __slots__ = ("_sections", "_main_content", "_sidebar", "_post_id", "__dict__")
 
-    def __init__(self, app_soup: "BeautifulSoup") -> None:
-        super().__init__(app_soup)
+    def __init__(self, app_tree: HtmlElement) -> None:
+        super().__init__(app_tree)
+        self._sections = _find_sections(self._tree)
         # main_content is the 'article' tag containing the main post content.
-        self._main_content = self._soup.find(
-            "article",
-            # id must be starting with 'post-' and followed by a number.
-            {"id": re.compile(r"^post-\d+$")}
-        )
-        if not self._main_content:
+        self._main_content = self._sections.get("article")
+        if self._main_content is None:
             raise NotFoundError("post not found", 404)
-        self._sidebar = self._soup.find("aside", class_="sidebar-single")
+        self._sidebar = self._sections.get("sidebar")
+        # the article's id is 'post-' followed by the post ID.
+        self._post_id = int(self._main_content.get("id")[5:])
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.post_id!r})"
@@ -163,92 +282,83 @@ class PostParser(BaseParser):
     @property
     def post_id(self) -> int:
         """Return the post ID."""
-        return int(self._main_content.get("id").split("-")[1])
+        return self._post_id
 
-    @property
+    @cached_property
     def title(self) -> str:
         """Return the title of the post."""
-        return self._soup.title.text.strip()
+        title = self._sections.get("title")
+        return "" if title is None else title.text_content().strip()
 
-    @property
+    @cached_property
     def description(self) -> str:
         """Return the description of the post."""
-        post_content = self._main_content.find("div", class_="post-content")
-        if not post_content:
+        post_content = _first(_POST_CONTENT_XP(self._main_content))
+        if post_content is None:
             return ""
-        return post_content.get_text(strip=True, separator=" ")
+        return _get_text(post_content)
 
-    @property
+    @cached_property
     def media(self) -> List[PostMedia]:
         """Return the media (image, video, etc.) of the post."""
         # screenshots gallery (contains screenshots and videos)
-        ss_gallery = self._soup.find("section", class_="screenshots-gallery")
-        if not ss_gallery:
-            return []
-        # TODO: write a better regex for media detection.
-        media = ss_gallery.find_all(href=re.compile(r"\.jpg|\.png|\.mp4|\.webm"))
-        if not media:
+        ss_gallery = self._sections.get("gallery")
+        if ss_gallery is None or not _MEDIA_LINKS_XP(ss_gallery):
             return []
         # TODO: isolate the media type (image, video, etc.) in a separate file among the other constants.
+        # the links are filtered by their file extension inside the XPath expressions
         screenshots = [
-            a.get("href") for a in media if a.get("href").endswith((".jpg", ".png"))
-        ]
-        videos = [a.get("href") for a in media if a.get("href").endswith((".mp4", ".webm"))]
-        thumbnail = self._sidebar.find(class_="post-thumbnail").find("img").get("data-src")
-        return [
-            *[PostMedia(url=screenshot, media_type="screenshot")
-              for screenshot in screenshots],
-            *[PostMedia(url=video, media_type="video") for video in videos],
-            PostMedia(url=thumbnail, media_type="thumbnail")
+            PostMedia(url=a.get("href"), media_type="screenshot") for a in _SCREENSHOT_LINKS_XP(ss_gallery)
         ]
+        videos = [PostMedia(url=a.get("href"), media_type="video") for a in _VIDEO_LINKS_XP(ss_gallery)]
+        thumbnail = _THUMBNAIL_IMG_XP(self._sidebar)[0].get("data-src")
+        return [*screenshots, *videos, PostMedia(url=thumbnail, media_type="thumbnail")]
 
-    @property
+    @cached_property
     def post_url(self) -> str:
         """URL of the post on the `farsroid.com` website."""
         return f"https://www.farsroid.com/?p={self.post_id}"
 
-    @property
+    @cached_property
     def meta(self) -> Optional[Dict[str, str]]:
         """Return the post metadata."""
         # TODO: clean code 'version' detection.
         meta_data = {
-            "version": by_pattern(r"\d+(\.\d+)*", self._main_content.find("h1").text),
+            "version": by_pattern(_VERSION_RE, self._main_content.find(".//h1").text_content()),
         }
         # if the post belongs to a game, add the 'mode' to the metadata
-        if game_mode := self._sidebar.find(class_="game-mode"):
-            meta_data["mode"] = "offline" if "آفلاین" in game_mode.text else "online"
-        meta_divs = self._sidebar.find_all("div", class_="inf-cnt")
+        if (game_mode := _first(_GAME_MODE_XP(self._sidebar))) is not None:
+            meta_data["mode"] = "offline" if "آفلاین" in game_mode.text_content() else "online"
+        meta_divs = _INFO_DIVS_XP(self._sidebar)
         for meta_div in meta_divs:
-            key: str = meta_div.span.text
-            value: str = meta_div.text.replace(key, "").strip()
+            label: str = meta_div.find(".//span").text_content()
+            value: str = meta_div.text_content().replace(label, "").strip()
             # Change persian key to english key.
-            if "اندروید" in key:
-                key = "required_android_version"
-            elif "دسته بندی" in key:
-                key = "category"
-            else:
-                key = ""
+            key = _meta_key(label, _POST_META_KEYS)
             if key and value:
                 meta_data[key] = value
         return meta_data
 
-    @property
+    @cached_property
     def related_posts(self) -> Optional[List[RelatedPost]]:
         # "rps" stands for 'related posts section'
-        rps = self._soup.find("section", class_="related-posts")
-        if not rps:
+        rps = self._sections.get("related_posts")
+        if rps is None:
             return
         # articles that has a class with pattern "post-\d+"
-        related_articles = rps.find_all(class_=re.compile(r"post-\d+"))
+        related_articles = [
+            tag for tag in _POST_CLASS_TAGS_XP(rps)
+            if any(_RELATED_POST_RE.search(cls) for cls in tag.classes)
+        ]
         if not related_articles:
             return
         # TODO: return a list of RelatedPost objects
         related_posts = []
         for article in related_articles:
-            post_id = int(by_pattern(r"\d+", " ".join(article.get("class"))))
-            post_title = article.get_text(strip=True, separator=" ")
+            post_id = int(by_pattern(_DIGITS_RE, article.get("class")))
+            post_title = _get_text(article)
             post_url = f"https://www.farsroid.com/?p={post_id}"
-            post_thumbnail = article.find_all("img")[0].get("data-src")
+            post_thumbnail = article.findall(".//img")[0].get("data-src")
             related_posts.append(
                 RelatedPost(
                     post_id=post_id,
@@ -259,26 +369,26 @@ class PostParser(BaseParser):
             )
         return related_posts
 
-    @property
+    @cached_property
     def gplay_url(self) -> Optional[str]:
         """Return the Google Play URL of the post if it exists."""
-        gplay_url = self._soup.find(class_="gply-link")
-        if not gplay_url:
+        gplay_url = self._sections.get("gplay_link")
+        if gplay_url is None:
             return
         return gplay_url.get("data-link", "")
 
-    @property
+    @cached_property
     def download_data(self) -> Optional[List[DownloadData]]:
         """Return a list of :class:`DownloadData` objects (if there is any link) `None` otherwise."""
-        download_box = self._soup.find(class_="download-links")
-        if not download_box:
+        download_box = self._sections.get("download_box")
+        if download_box is None:
             return
         # download links must have one of the (".apk", ".zip", ".obb", ".rar") extensions
-        dl_links = download_box.find_all(href=re.compile(r"\.(apk|zip|obb|rar)$"))
+        dl_links = _DL_LINKS_XP(download_box)
         if not dl_links:
             return
         return [
-            DownloadData(url=a.get("href"), title=a.text.strip())
+            DownloadData(url=a.get("href"), title=a.text_content().strip())
             for a in dl_links
         ]
 
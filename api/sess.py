@@ -1,9 +1,29 @@
-from typing import Any, ClassVar, Dict, Optional
-from urllib.parse import urljoin
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+    Type
+)
+
+import orjson
+from httpx import AsyncClient, ConnectError, ConnectTimeout, Limits, Response, Timeout
+from lxml import etree
+from lxml.html import HTMLParser, HtmlElement, document_fromstring
 
-from bs4 import BeautifulSoup
-from httpx import AsyncClient, ConnectError, ConnectTimeout, Response 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer
 
+from .cache import TTLCache
 from .exceptions import (
     AccessDeniedError,
     BadRequestError,
@@ -12,38 +32,82 @@ from .exceptions import (
 )
 
 
+_OK_STATUS_CODES = frozenset((200, 301, 302, 304))
+"""Status codes of the responses that are considered successful."""
+_STATUS_ERRORS: Dict[int, Tuple[Type[FRoidAPIError], str]] = {
+    400: (BadRequestError, "Bad request"),
+    401: (AccessDeniedError, "Access denied"),
+    403: (AccessDeniedError, "Access denied"),
+    404: (NotFoundError, "Not found"),
+}
+"""Error class and message to raise for each known error status code."""
+_UNKNOWN_ERROR = (FRoidAPIError, "Unknown error")
+
+
 def _validate_response(response: Response) -> Response:
     """Validate the given response and return it if everything was ok."""
     st_code = response.status_code
-    if st_code not in (200, 301, 302, 304):
-        if st_code == 400:
-            raise BadRequestError("Bad request", st_code)
-        elif st_code in (401, 403):
-            raise AccessDeniedError("Access denied", st_code)
-        elif st_code == 404:
-            raise NotFoundError("Not found", st_code)
-        else:
-            raise FRoidAPIError("Unknown error", st_code)
-    return response
+    if st_code in _OK_STATUS_CODES:
+        return response
+    error_cls, message = _STATUS_ERRORS.get(st_code, _UNKNOWN_ERROR)
+    raise error_cls(message, st_code)
+
+
+_VALIDATOR_HEADERS = ("etag", "last-modified")
+"""Response headers used to revalidate a cached page with a conditional request."""
+
+
+async def _parse_html(response: Response) -> HtmlElement:
+    """Feed the body of a streamed response to :mod:`lxml` chunk by chunk and return the document."""
+    # farsroid.com pages are UTF-8 encoded when the charset is not specified.
+    parser = HTMLParser(encoding=response.charset_encoding or "utf-8")
+    async for chunk in response.aiter_bytes():
+        parser.feed(chunk)
+    try:
+        root = parser.close()
+    except (etree.XMLSyntaxError, etree.ParserError):
+        root = None
+    if root is None:
+        # libxml2 refuses (or returns no document for) empty and blank bodies, treat them
+        # as a page without any content, so parsers report it the same way (e.g. post not
+        # found, no results).
+        return document_fromstring("<html><body></body></html>")
+    return root
 
 
 class Session:
     """An asynchronous session for requesting `farsroid.com` endpoints.
 
     Parameters:
-        html_parser (`str`, optional): The HTML parser to use for parsing the HTML responses
-        as :class:`BeautifulSoup` objects.
+        html_parser (`str`, optional): The HTML parser :meth:`Session.get_soup` uses to build
+        :class:`BeautifulSoup` objects. The other methods always parse with :mod:`lxml`.
+        cache_ttl (`float`, optional): Number of seconds to cache the responses of
+        :meth:`Session.get_json`, :meth:`Session.get_text` and :meth:`Session.get_soup`
+        for. Caching is disabled by default.
+        client (:class:`httpx.AsyncClient`, optional): The client to send the requests with,
+        it must be created with ``base_url=Session.BASE_URL``. Defaults to the
+        application-wide client returned by :func:`get_default_client`.
+        concurrency (`int`, optional): Maximum number of requests the session sends
+        at the same time. Defaults to :attr:`DEFAULT_CONCURRENCY`.
 
     :class:`Session` is a wrapper for :class:`httpx.AsyncClient` that can
     validate the request and response and return various types of data
-    (`json`, `text` and :class:`BeautifulSoup` object).
+    (`json`, `text`, :class:`BeautifulSoup` object and :class:`lxml.html.HtmlElement` document).
+
+    Every session shares one pooled client by default, so all the requests to
+    `farsroid.com` reuse the same keep-alive connections. Avoid creating a new
+    client per request; it pays a TCP and TLS handshake for every call.
+
+    Requests are sent through a semaphore, so callers fanning out many requests
+    (e.g. with :func:`asyncio.gather`) don't overwhelm `farsroid.com` and get
+    rate limited. Between 10 and 20 concurrent requests works best in practice.
     
     To request a URL that is not `farsroid.com` endpoints, use the
     :meth:`Session.client` method to get a :class:`httpx.AsyncClient` object and
     then use the :meth:`httpx.AsyncClient.request` method on it.
 
-    Default HTML parser for :class:`BeautifulSoup` is `lxml` but you can
-    specify another parser by setting the `html_parser` argument in the constructor.
+    Default HTML parser for :class:`BeautifulSoup` is `lxml` but you can specify another
+    parser for :meth:`Session.get_soup` by setting the `html_parser` argument in the constructor.
     """
 
     BASE_URL: ClassVar[str] = "https://www.farsroid.com/"
@@ -55,21 +119,40 @@ class Session:
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:95.0) Gecko/20100101 Firefox/95.0",
     }
     """Headers to be added to every request."""
+    DEFAULT_CONCURRENCY: ClassVar[int] = 12
+    """Default maximum number of concurrent requests of a session."""
 
-    __slots__ = ("_sess", "_html_parser")
+    __slots__ = ("_client", "_html_parser", "_cache", "_pending", "_concurrency", "_limiter")
 
-    def __init__(self, html_parser: Optional[str] = None) -> None:
+    def __init__(
+            self,
+            html_parser: Optional[str] = None,
+            cache_ttl: Optional[float] = None,
+            client: Optional[AsyncClient] = None,
+            concurrency: int = DEFAULT_CONCURRENCY
+    ) -> None:
         self._html_parser = html_parser or self.DEFAULT_HTML_PARSER
         if not isinstance(self._html_parser, str):
             raise TypeError("html_parser must be a string or None")
-        self._sess = AsyncClient(follow_redirects=True, headers=self.REQ_HEADERS)
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+        if client is not None and not client.base_url.is_absolute_url:
+            raise ValueError("client must be created with base_url=Session.BASE_URL")
+        self._client = client
+        self._cache = TTLCache(cache_ttl) if cache_ttl else None
+        # in-flight fetches of cacheable responses, shared by concurrent callers
+        self._pending: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._concurrency = concurrency
+        # created on the first request so it's bound to the running event loop
+        self._limiter: Optional[asyncio.Semaphore] = None
 
     def __repr__(self) -> str:
         return (
             f"{self.__class__.__name__}"
             f"(html_parser={self._html_parser!r}, "
             f"base_url={self.BASE_URL!r}, "
-            f"alive={not self._sess.is_closed})"
+            f"shared={self._client is None}, "
+            f"alive={not self.client.is_closed})"
         )
 
     def __enter__(self) -> "Session":
@@ -81,13 +164,19 @@ class Session:
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
         await self.close()
 
+    def _get_limiter(self) -> asyncio.Semaphore:
+        """Return the semaphore limiting the concurrent requests of the session."""
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self._concurrency)
+        return self._limiter
+
     @property
     def client(self) -> AsyncClient:
         """
         Return the underlying asynchronous :class:`httpx.AsyncClient` object used 
         by the :class:`api.sess.Session` object to make requests.
         """
-        return self._sess
+        return self._client if self._client is not None else get_default_client()
 
     async def request(self, method: str, endpoint: str, **kwargs) -> Response:
         """Make a request to the given URL and return the response.
@@ -100,9 +189,28 @@ class Session:
         Returns:
             :class:`httpx.Response`: The response object.
         """
-        url = urljoin(self.BASE_URL, endpoint)
         try:
-            return _validate_response(await self._sess.request(method, url, **kwargs))
+            async with self._get_limiter():
+                return _validate_response(await self.client.request(method, endpoint, **kwargs))
+        except (ConnectError, ConnectTimeout):
+            raise FRoidAPIError("Connection establishment to farsroid.com failed", 500)
+
+    @asynccontextmanager
+    async def stream(self, method: str, endpoint: str, **kwargs) -> AsyncIterator[Response]:
+        """Make a request to the given URL and yield the validated response before its body is read.
+
+        Parameters:
+            method (`str`): The HTTP method to use.
+            endpoint (`str`): The URL endpoint to request.
+            **kwargs: Additional keyword arguments to pass to :meth:`httpx.AsyncClient.stream` method.
+
+        Yields:
+            :class:`httpx.Response`: The response object whose body can be iterated
+            with :meth:`httpx.Response.aiter_bytes`.
+        """
+        try:
+            async with self._get_limiter(), self.client.stream(method, endpoint, **kwargs) as resp:
+                yield _validate_response(resp)
         except (ConnectError, ConnectTimeout):
             raise FRoidAPIError("Connection establishment to farsroid.com failed", 500)
 
@@ -115,9 +223,45 @@ class Session:
 
         Returns:
             `dict`: The JSON response.
+
+        * If caching is enabled (see `cache_ttl`), responses of requests without any
+          extra keyword arguments are cached by their endpoint. Cached data is shared
+          between callers, so it must not be mutated.
+        * Concurrent cacheable requests for the same endpoint share a single request.
         """
-        resp = await self.request("GET", endpoint, **kwargs)
-        return resp.json()
+        if self._cache is None or kwargs:
+            resp = await self.request("GET", endpoint, **kwargs)
+            return orjson.loads(resp.content)
+        return await self._get_or_fetch(("json", endpoint), partial(self._fetch_json, endpoint))
+
+    async def _fetch_json(self, endpoint: str) -> Any:
+        resp = await self.request("GET", endpoint)
+        # orjson decodes the raw UTF-8 body directly, without building a `str` first
+        return orjson.loads(resp.content)
+
+    async def _get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value of `key` or call `fetch` and cache its result.
+
+        Concurrent callers missing the cache for the same key share a single
+        in-flight fetch, so a burst of requests for a popular post doesn't send
+        the same request to `farsroid.com` many times.
+        """
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(fetch())
+
+            def _done(fut: "asyncio.Future[Any]") -> None:
+                if self._pending.get(key) is fut:
+                    del self._pending[key]
+                if not fut.cancelled() and fut.exception() is None:
+                    self._cache.set(key, fut.result())
+
+            pending.add_done_callback(_done)
+        # shield the shared fetch, so a cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(pending)
 
     async def get_text(self, endpoint: str, **kwargs) -> str:
         """Make a GET request to the given URL and return the response as text.
@@ -128,23 +272,155 @@ class Session:
 
         Returns:
             `str`: The text response.
+
+        * Responses are cached the same way as :meth:`Session.get_json` if caching is enabled.
         """
+        cacheable = self._cache is not None and not kwargs
+        if cacheable and (cached := self._cache.get(("text", endpoint))) is not None:
+            return cached
         resp = await self.request("GET", endpoint, **kwargs)
-        return resp.text
+        text = resp.text
+        if cacheable:
+            self._cache.set(("text", endpoint), text)
+        return text
 
-    async def get_soup(self, endpoint: str, **kwargs) -> BeautifulSoup:
+    async def get_soup(
+            self,
+            endpoint: str,
+            parse_only: Optional["SoupStrainer"] = None,
+            **kwargs
+    ) -> "BeautifulSoup":
         """Make a GET request to the given URL and return the response as a :class:`BeautifulSoup` object.
 
         Parameters:
             endpoint (`str`): The URL endpoint to request.
+            parse_only (:class:`bs4.SoupStrainer`, optional): Only build the parts of the
+            document matched by the strainer. Use it when only a small part of the page is needed.
             **kwargs: Additional keyword arguments to pass to :meth:`Session.request` method.
 
         Returns:
             :class:`BeautifulSoup`: The BeautifulSoup object.
+
+        * The raw response body is passed to the parser, so it's decoded only once
+          (by the parser itself) instead of being decoded to `str` first.
+        * If caching is enabled, the raw body (not the mutable soup object) is cached
+          the same way as :meth:`Session.get_json`, so cache hits skip the request.
         """
-        resp = await self.request("GET", endpoint, **kwargs)
-        return BeautifulSoup(resp.text, self._html_parser)
+        # bs4 is only imported when it's actually used, the parsers work on lxml documents.
+        from bs4 import BeautifulSoup
+
+        cacheable = self._cache is not None and not kwargs
+        body = self._cache.get(("body", endpoint)) if cacheable else None
+        if body is None:
+            resp = await self.request("GET", endpoint, **kwargs)
+            # farsroid.com pages are UTF-8 encoded when the charset is not specified.
+            body = (resp.content, resp.charset_encoding or "utf-8")
+            if cacheable:
+                self._cache.set(("body", endpoint), body)
+        content, encoding = body
+        return BeautifulSoup(content, self._html_parser, parse_only=parse_only, from_encoding=encoding)
+
+    async def get_html(self, endpoint: str, **kwargs) -> HtmlElement:
+        """Make a GET request to the given URL and return the response as a parsed :mod:`lxml` document.
+
+        Parameters:
+            endpoint (`str`): The URL endpoint to request.
+            **kwargs: Additional keyword arguments to pass to :meth:`Session.request` method.
+
+        Returns:
+            :class:`lxml.html.HtmlElement`: The root element of the HTML document.
+
+        * The body is fed to the parser chunk by chunk while it's being downloaded,
+          so parsing overlaps the network transfer and the whole page is never
+          decoded into a single `str`.
+        """
+        async with self.stream("GET", endpoint, **kwargs) as resp:
+            return await _parse_html(resp)
+
+    async def get_html_if_modified(
+            self,
+            endpoint: str,
+            validators: Optional[Dict[str, str]] = None,
+            **kwargs
+    ) -> Tuple[Optional[HtmlElement], Dict[str, str]]:
+        """Make a conditional GET request and return the parsed document only if it has changed.
+
+        Parameters:
+            endpoint (`str`): The URL endpoint to request.
+            validators (`Dict[str, str]`, optional): The `ETag` and/or `Last-Modified`
+            headers of a previous response of the endpoint (as returned by this method).
+            **kwargs: Additional keyword arguments to pass to :meth:`Session.stream` method.
+
+        Returns:
+            A tuple of the :class:`lxml.html.HtmlElement` document (or `None` if the page
+            was not modified since the previous response) and the validators of the response.
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        if validators:
+            if "etag" in validators:
+                headers["If-None-Match"] = validators["etag"]
+            if "last-modified" in validators:
+                headers["If-Modified-Since"] = validators["last-modified"]
+        async with self.stream("GET", endpoint, headers=headers, **kwargs) as resp:
+            if resp.status_code == 304:
+                return None, validators
+            new_validators = {name: resp.headers[name] for name in _VALIDATOR_HEADERS if name in resp.headers}
+            return await _parse_html(resp), new_validators
 
     async def close(self) -> None:
-        """Close the session."""
-        await self._sess.aclose()
+        """Close the session.
+
+        The shared client is left open for the other sessions (see :func:`close_default_client`),
+        only a client that was passed to the constructor is closed.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+
+
+DEFAULT_LIMITS = Limits(
+    max_connections=Session.DEFAULT_CONCURRENCY,
+    max_keepalive_connections=Session.DEFAULT_CONCURRENCY,
+    keepalive_expiry=120
+)
+"""Connection pool limits of the shared client.
+
+The pool is sized to the concurrency limit of a session (:attr:`Session.DEFAULT_CONCURRENCY`),
+which already caps the requests in flight, so a larger pool would never be used.
+Every request goes to a single host, so the whole pool is kept alive for reuse
+which skips the DNS lookup and TLS handshake of new connections.
+"""
+DEFAULT_TIMEOUT = Timeout(30.0, connect=5.0)
+"""Timeouts of the shared client, connecting fails fast while slow pages still get time to download."""
+
+_default_client: Optional[AsyncClient] = None
+
+
+def get_default_client() -> AsyncClient:
+    """Return the application-wide :class:`httpx.AsyncClient` shared by the sessions.
+
+    The client is created lazily on first use (and again if it was closed).
+    HTTP/2 is enabled so concurrent requests are multiplexed over the pooled
+    connections instead of each one waiting for a connection of its own.
+
+    * The number of requests in flight is limited by the `concurrency` of the sessions,
+      the pool limits (:data:`DEFAULT_LIMITS`) only match the default concurrency.
+      Sessions with a higher `concurrency` (or several sessions sharing the client) wait
+      for a pooled connection on HTTP/1.1, pass them a client with larger limits instead.
+    """
+    global _default_client
+    if _default_client is None or _default_client.is_closed:
+        _default_client = AsyncClient(
+            base_url=Session.BASE_URL,
+            http2=True,
+            follow_redirects=True,
+            headers=Session.REQ_HEADERS,
+            limits=DEFAULT_LIMITS,
+            timeout=DEFAULT_TIMEOUT
+        )
+    return _default_client
+
+
+async def close_default_client() -> None:
+    """Close the shared client (e.g. on application shutdown)."""
+    if _default_client is not None:
+        await _default_client.aclose()
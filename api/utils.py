@@ -1,20 +1,40 @@
 import re
-from typing import Iterable, Optional, Union
+from html import unescape
+from typing import Dict, Iterable, Optional, Union
 
-from bs4 import BeautifulSoup
+_TAG_RE = re.compile(r"<!--.*?-->|</?[a-zA-Z][^>]*>|<[!?][^>]*>", re.DOTALL)
+"""Matches HTML tags and comments (used to split the rendered content into its texts).
+
+A `<` that doesn't start a tag (e.g. `1 <2` or `a <= b`) is text, like the HTML parsers treat it.
+"""
+_PATTERN_CACHE: Dict[str, "re.Pattern[str]"] = {}
+"""Compiled patterns of the strings passed to :func:`by_pattern`."""
 
 
 def render_content(content: str) -> str:
-    """Renders content from HTML to plain text."""
+    """Renders content from HTML to plain text.
+
+    The content is split on the tags in a single regex pass and the texts between them
+    are unescaped, stripped and joined with spaces (the same output as
+    ``BeautifulSoup(content).get_text(" ", strip=True)``), so no HTML tree is built
+    for short snippets like comments.
+    """
     if not content:
         return ""
-    soup = BeautifulSoup(content, "lxml")
-    return soup.get_text(separator=" ", strip=True)
+    texts = (unescape(text).strip() for text in _TAG_RE.split(content))
+    return " ".join(text for text in texts if text)
+
 
+def by_pattern(pattern: Union[str, "re.Pattern[str]"], text: str) -> Optional[str]:
+    """Returns the first match of the given pattern in the given text.
 
-def by_pattern(pattern: str, text: str) -> Optional[str]:
-    """Returns the first match of the given pattern in the given text."""
-    pattern_re = re.compile(pattern)
-    if pattern_re.search(text):
-        return pattern_re.search(text).group()
-    return
+    The pattern can be a precompiled :class:`re.Pattern` object, string patterns
+    are compiled on their first use and then looked up in a module-level cache.
+    """
+    if not isinstance(pattern, re.Pattern):
+        compiled = _PATTERN_CACHE.get(pattern)
+        if compiled is None:
+            compiled = _PATTERN_CACHE[pattern] = re.compile(pattern)
+        pattern = compiled
+    match = pattern.search(text)
+    return match.group(0) if match else None
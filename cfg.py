@@ -1,5 +1,14 @@
+import sys
 from configparser import ConfigParser
-from typing import Dict, Iterable, List, Union
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple, Union
+
+
+@lru_cache(maxsize=None)
+def _load_config(paths: Tuple[str, ...]) -> ConfigParser:
+    config = ConfigParser(comment_prefixes=("#", ";"))
+    config.read(paths)
+    return config
 
 
 def config_loader(path: Union[str, Iterable[str]] = "config.ini") -> ConfigParser:
@@ -10,10 +19,19 @@ def config_loader(path: Union[str, Iterable[str]] = "config.ini") -> ConfigParse
 
     Returns:
         `ConfigParser`: The configuration file as a `ConfigParser` object.
+
+    * The files are only read once, later calls with the same path(s) return
+      the same (shared) `ConfigParser` object.
     """
-    config = ConfigParser(comment_prefixes=("#", ";"))
-    config.read(path)
-    return config
+    return _load_config((path,) if isinstance(path, str) else tuple(path))
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    """Split a comma separated config value into a tuple of stripped (and interned) items.
+
+    Empty items (e.g. from a trailing comma) are dropped.
+    """
+    return tuple(sys.intern(item) for item in map(str.strip, value.split(",")) if item)
 
 
 cfg = config_loader()
@@ -33,15 +51,19 @@ DEBUG: bool = cfg["COMMON"].getboolean("DEBUG")
 """Set to `True` to see the error message in the browser."""
 
 # CORS Config
-ORIGINS: List[str] = cfg["CORS"]["ORIGINS"].split(",")
+ORIGINS: Tuple[str, ...] = _split(cfg["CORS"]["ORIGINS"])
 """List of origins that are allowed to access the API."""
 ALLOW_CREDENTIALS: bool = cfg["CORS"].getboolean("ALLOW_CREDENTIALS")
 """Whether or not to allow credentials to be sent with the request."""
-ALLOW_METHODS: List[str] = cfg["CORS"]["ALLOW_METHODS"].split(",")
+ALLOW_METHODS: Tuple[str, ...] = _split(cfg["CORS"]["ALLOW_METHODS"])
 """List of HTTP methods that are allowed to access the API."""
-ALLOW_HEADERS: List[str] = cfg["CORS"]["ALLOW_HEADERS"].split(",")
+ALLOW_HEADERS: Tuple[str, ...] = _split(cfg["CORS"]["ALLOW_HEADERS"])
 """Which headers are allowed to be sent with the request."""
 
+# API Config
+API_CACHE_TTL: float = cfg["API"].getfloat("CACHE_TTL")
+"""Number of seconds to cache the farsroid.com JSON API responses, `0` disables caching."""
+
 # Docs Config
 DOCS_URL: str = cfg["DOCS"]["URL"]
 """URL to the API documentation page."""
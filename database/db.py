@@ -1,9 +1,10 @@
 import os
 from typing import TYPE_CHECKING, Any, Dict, Iterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
@@ -32,12 +33,73 @@ engine_kwargs: Dict[str, Any] = (
 If the database is local, then add the `check_same_thread` option for 
 `SQLite` databases (it lets us to use different threads for the database). 
 """
+EXTERNAL_POOL: bool = os.getenv("DATABASE_EXTERNAL_POOL", "").lower() in ("1", "true", "yes")
+"""Whether `DATABASE_URL` points to an external connection pooler (e.g. `PgBouncer`)
+shared by every worker process. It can be set by the `DATABASE_EXTERNAL_POOL` environment variable.
+"""
+
+WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "4"))
+"""Number of worker processes that each keep their own connection pool (4 by default, see `Procfile`)."""
+DATABASE_MAX_CONNECTIONS: int = int(os.getenv("DATABASE_MAX_CONNECTIONS", "20"))
+"""Number of connections the database server accepts (20 on the Heroku Postgres hobby plans).
+It can be set by the `DATABASE_MAX_CONNECTIONS` environment variable.
+"""
+# connections each worker can use without the workers together exceeding the server's limit
+_worker_connections = max(2, DATABASE_MAX_CONNECTIONS // WEB_CONCURRENCY)
+POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", _worker_connections // 2))
+"""Number of connections each worker keeps open to a remote database,
+it can be set by the `DATABASE_POOL_SIZE` environment variable.
+"""
+MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", max(0, _worker_connections - POOL_SIZE)))
+"""Number of extra connections each worker may open to a remote database under load,
+it can be set by the `DATABASE_MAX_OVERFLOW` environment variable.
+"""
+
+# Connection pool options for the database engine.
+# Remote database pools are sized so all the workers together (`WEB_CONCURRENCY`) stay within
+# the server's `DATABASE_MAX_CONNECTIONS`, and their connections are recycled after 30 minutes,
+# before the server closes them on its side. `SQLite` files reuse pooled connections (keeping
+# their page cache and pragmas) instead of opening one for every request, up to 40 of them,
+# one for each thread of the threadpool that runs the (synchronous) database endpoints.
+# Connections aren't pooled in the process when an external pooler is used (see `EXTERNAL_POOL`).
+if EXTERNAL_POOL:
+    # the pooler keeps the server connections open, keeping another pool in
+    # each worker would only hold on to the pooler's client slots.
+    pool_kwargs: Dict[str, Any] = {"poolclass": NullPool}
+elif not LOCAL_DB:
+    pool_kwargs = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+    }
+elif SQLALCHEMY_DATABASE_URL != "sqlite://" and ":memory:" not in SQLALCHEMY_DATABASE_URL:
+    # SQLAlchemy opens a new connection per session for SQLite files by default
+    pool_kwargs = {"poolclass": QueuePool, "pool_size": 20, "max_overflow": 20}
+else:
+    pool_kwargs = {}
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     # If we're using SQLite, we need to specify the below option.
     connect_args=engine_kwargs,
+    # test pooled connections before using them, so connections dropped by
+    # the server after being idle are replaced instead of failing the request.
+    pool_pre_ping=True,
+    **pool_kwargs,
 )
 """Database engine to connect to the database and perform queries."""
+
+if LOCAL_DB:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection: Any, _: Any) -> None:
+        """Use write-ahead logging so readers don't block writers and commits need fewer fsyncs."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 """Session factory for SQLAlchemy, which is used to create a session."""
 Base = declarative_base()
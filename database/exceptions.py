@@ -19,4 +19,12 @@ class OldCredentialsError(DatabaseError):
     
 class TokenNotFoundError(DatabaseError):
     """Raised when a token is not found."""
-    
\ No newline at end of file
+
+
+class UserExistsError(DatabaseError):
+    """Raised when the username or email of a new user is already registered."""
+
+    def __init__(self, message: str, field: str, *args) -> None:
+        super().__init__(message, *args)
+        self.field = field
+        """Name of the field that is already taken (`username` or `email`)."""
@@ -1,6 +1,5 @@
 from datetime import datetime as dt
-from hashlib import sha256
-from secrets import token_urlsafe
+from secrets import token_hex
 from typing import Any, Dict, Optional
 
 import sqlalchemy as sa
@@ -21,24 +20,30 @@ class User(Base):
     """Unique email address of the user."""
     hashed_password: str = sa.Column(sa.String, nullable=False)
     """Hashed password of the user."""
-    created_at: dt = sa.Column(sa.DateTime, default=dt.now())
+    created_at: dt = sa.Column(sa.DateTime, default=dt.now)
     """Creation datetime of the user."""
-    token: Optional["Token"] = relationship("Token", uselist=False, back_populates="user")
+    # tokens are loaded with a single "SELECT ... IN" for all the users of a query
+    # (every user response includes the token) instead of one query per user.
+    token: Optional["Token"] = relationship("Token", uselist=False, back_populates="user", lazy="selectin")
     """User's token (if any)."""
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}({", ".join(map(lambda k, v: f"{k}={v!r}", self.json().items()))})'
+        return f'{self.__class__.__name__}({", ".join(f"{k}={v!r}" for k, v in self.json().items())})'
 
-    def json(self) -> Dict[str, Any]:
-        """Return a JSON representation of the user."""
+    def _json_shallow(self) -> Dict[str, Any]:
+        """Return a JSON representation of the user without its token."""
         return {
             "id": self.id,
             "username": self.username,
             "email": self.email,
-            "created_at": self.created_at.isoformat(),
-            "token": self.token.json() if self.token else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
+    def json(self) -> Dict[str, Any]:
+        """Return a JSON representation of the user."""
+        # the token's user is not included, it would refer back to this user.
+        return {**self._json_shallow(), "token": self.token._json_shallow() if self.token else None}
+
 
 class Token(Base):
     """Model for users' token in the database."""
@@ -52,24 +57,28 @@ class Token(Base):
     """Unique identifier for the user."""
     user: "User" = relationship("User", back_populates="token")
     """User that owns the token."""
-    created_at: dt = sa.Column(sa.DateTime, default=dt.now())
+    created_at: dt = sa.Column(sa.DateTime, default=dt.now)
     """Creation datetime of the token."""
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}({", ".join(map(lambda k, v: f"{k}={v!r}", self.json().items()))})'
+        return f'{self.__class__.__name__}({", ".join(f"{k}={v!r}" for k, v in self.json().items())})'
 
-    def json(self) -> Dict[str, Any]:
-        """Return a JSON representation of the token."""
+    def _json_shallow(self) -> Dict[str, Any]:
+        """Return a JSON representation of the token without its user."""
         return {
             "id": self.id,
             "token": self.token,
             "user_id": self.user_id,
-            "user": self.user.json() if self.user else None,
-            "created_at": self.created_at.isoformat()
+            "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
+    def json(self) -> Dict[str, Any]:
+        """Return a JSON representation of the token."""
+        # the user's token is not included, it would refer back to this token.
+        return {**self._json_shallow(), "user": self.user._json_shallow() if self.user else None}
+
     @staticmethod
     def generate_token_string() -> str:
         """Generate a random 32-character token string."""
-        token = token_urlsafe(32).encode()
-        return sha256(token).hexdigest()[:32]
+        # 16 random bytes as hex, the same format the sha256 digest prefix had.
+        return token_hex(16)
@@ -3,37 +3,65 @@ from typing import TYPE_CHECKING, List, Optional
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
 
-from passlib.context import CryptContext
+from passlib.hash import bcrypt
+from sqlalchemy import bindparam, exists, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from . import models, schemas
 from .exceptions import (
     AuthenticationError,
     OldCredentialsError,
     TokenNotFoundError,
+    UserExistsError,
     UserNotFoundError
 )
 
+BCRYPT_ROUNDS: int = 12
+"""Cost factor of the password hashes (each extra round doubles the hashing time)."""
+
 # install passlib[bcrypt] module first
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt is the only scheme in use, so its handler is used directly instead of
+# a `CryptContext` which identifies the scheme of the hash on every call.
+pwd_hasher = bcrypt.using(rounds=BCRYPT_ROUNDS)
+
+# The statement is built once, so SQLAlchemy's compiled cache is hit on every call.
+# The user's token is loaded by the same query (users are mostly fetched to be
+# authenticated and their token is used by the token endpoints right after).
+_USER_BY_USERNAME = (
+    select(models.User)
+    .options(joinedload(models.User.token))
+    .where(models.User.username == bindparam("username"))
+)
+# Locks the user's row until the transaction ends (the token is on the nullable side of
+# the outer join, so only the users table is locked).
+_USER_BY_USERNAME_FOR_UPDATE = _USER_BY_USERNAME.with_for_update(of=models.User)
 
 
 def hash_password(password: str) -> str:
     """Hash user password with `bcrypt` algorithm and return the hash."""
-    return pwd_context.hash(password)
+    return pwd_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify that a plain text password matches a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_hasher.verify(plain_password, hashed_password)
 
 
-def authenticate_user(db: "Session", username: str, password: str) -> models.User:
+def authenticate_user(
+        db: "Session",
+        username: str,
+        password: str,
+        for_update: bool = False
+) -> models.User:
     """Authenticate a user by username and password.
 
     Parameters:
         db (:class:`sqlalchemy.orm.Session`): Database session.
         username (`str`): Username of the user.
         password (`str`): Password of the user.
+        for_update (`bool`, optional): Lock the user's row until the session commits, so
+        the user can't be changed or deleted by another request before it's updated.
 
     Returns:
         :class:`database.models.User`: Authenticated user.
@@ -42,7 +70,7 @@ def authenticate_user(db: "Session", username: str, password: str) -> models.Use
         :class:`database.exceptions.AuthenticationError`: If authentication fails.
         :class:`database.exceptions.UserNotFoundError`: If user is not found.
     """
-    user = get_user_by_username(db, username)
+    user = get_user_by_username(db, username, for_update)
     if not user:
         raise UserNotFoundError(f"User with username {username!r} not found.")
     if not verify_password(password, user.hashed_password):
@@ -55,9 +83,19 @@ def get_user_by_email(db: "Session", email: str) -> Optional["models.User"]:
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def get_user_by_username(db: "Session", username: str) -> Optional["models.User"]:
-    """Get a user from the database by username."""
-    return db.query(models.User).filter(models.User.username == username).first()
+def get_user_by_username(
+        db: "Session",
+        username: str,
+        for_update: bool = False
+) -> Optional["models.User"]:
+    """Get a user from the database by username (and lock its row if `for_update` is set)."""
+    stmt = _USER_BY_USERNAME_FOR_UPDATE if for_update else _USER_BY_USERNAME
+    return db.execute(stmt, {"username": username}).scalar_one_or_none()
+
+
+def user_exists(db: "Session", username: str) -> bool:
+    """Check whether a user with the given username exists, without loading the user."""
+    return db.query(exists().where(models.User.username == username)).scalar()
 
 
 def get_users(db: "Session", skip: int = 0, limit: int = 100) -> List["models.User"]:
@@ -83,13 +121,61 @@ def save_user(db: "Session", user: schemas.UserCreate) -> models.User:
 
     Returns:
         :class:`database.models.User`: Created user.
+
+    Raises:
+        :class:`database.exceptions.UserExistsError`: If the username or email is taken.
+    """
+    to_save = user.dict()
+    to_save["hashed_password"] = hash_password(to_save.pop("password"))
+    # a new user has no token, setting it keeps the relationship from being loaded later
+    db_user = models.User(**to_save, token=None)
+    db.add(db_user)
+    _commit_new_user(db, user)
+    return db_user
+
+
+def _commit_new_user(db: "Session", user: schemas.UserCreate) -> None:
+    """Commit a new user and raise :class:`UserExistsError` if it violates a unique constraint.
+
+    The user is inserted right away instead of checking its username first, so new
+    users take a single query and two concurrent registrations can't both pass the check.
+    The new objects aren't expired by the commit, the flush already filled in their IDs
+    and defaults (`created_at` is set on the Python side), so they aren't selected again.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        # only taken usernames and emails violate the constraints of a new user
+        field = "username" if user_exists(db, user.username) else "email"
+        raise UserExistsError(f"User with this {field} already exists.", field)
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+def save_user_with_token(db: "Session", user: schemas.UserCreate) -> models.User:
+    """Save a user along with a new token for it in a single transaction.
+
+    Parameters:
+        db (:class:`sqlalchemy.orm.Session`): Database session.
+        user (:class:`database.schemas.UserCreate`): User to create.
+
+    Returns:
+        :class:`database.models.User`: Created user, with its :class:`database.models.Token`.
+
+    Raises:
+        :class:`database.exceptions.UserExistsError`: If the username or email is taken.
     """
     to_save = user.dict()
     to_save["hashed_password"] = hash_password(to_save.pop("password"))
     db_user = models.User(**to_save)
+    # the token is linked through the relationship, so both rows are inserted by
+    # the same flush (the user's ID is filled in by SQLAlchemy) and committed once.
+    models.Token(token=models.Token.generate_token_string(), user=db_user)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    _commit_new_user(db, user)
     return db_user
 
 
@@ -131,8 +217,8 @@ def revoke_token(db: "Session", user: models.User) -> models.Token:
         )
     user_token = user.token
     db.delete(user_token)
+    # the user is expired by the commit, so it's reloaded only if it's used again.
     db.commit()
-    db.refresh(user)
     return user_token
 
 
@@ -1,17 +1,38 @@
-from typing import Any, Callable
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, ClassVar
 
+import orjson
 from fastapi import APIRouter, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import Scope
 
 import cfg
 from api import FRoidAPIError, ParserError
+from api.sess import close_default_client
 from database import db
 from routers import posts, users
-from routers.base import api_handler, raise_error
+from routers.base import FroidAPIHandler
+
+
+class CachedStaticFiles(StaticFiles):
+    """Static files that browsers may cache for a week instead of revalidating on every page load."""
+
+    CACHE_CONTROL: ClassVar[str] = "public, max-age=604800"
+    """`Cache-Control` header added to the successful (and not modified) responses."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.CACHE_CONTROL
+        return response
+
 
 base_router = APIRouter(
     prefix="/v1",
@@ -44,12 +65,14 @@ app = FastAPI(
     description=cfg.APP_DESCRIPTION,
     contact=cfg.CONTACT_INFO,
     openapi_tags=endpoint_tags,
-    openapi_url=cfg.OPENAPI_URL,
+    # the schema is served from a cached, pre-serialized copy (see `openapi_schema`)
+    openapi_url=None,
     redoc_url=None,  # Disable the redoc_url to avoid the redoc-ui to be loaded
+    default_response_class=ORJSONResponse,
 )
 app.include_router(base_router)
 # mount the static files path
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 # add CORS middleware to the app
 app.add_middleware(
     CORSMiddleware,
@@ -60,59 +83,80 @@ app.add_middleware(
 )
 
 
+# The swagger UI page only depends on the config, so render it once.
+_SWAGGER_HTML: bytes = get_swagger_ui_html(
+    openapi_url=cfg.OPENAPI_URL,
+    title=cfg.DOCS_TITLE,
+    swagger_favicon_url=cfg.DOCS_FAVICON_URL
+).body
+
+
+@lru_cache(maxsize=None)
+def _openapi_json() -> bytes:
+    """Generate the OpenAPI schema once and return it serialized to `JSON`."""
+    return orjson.dumps(app.openapi())
+
+
+@app.get(cfg.OPENAPI_URL, include_in_schema=False)
+async def openapi_schema() -> Response:
+    """Return the OpenAPI specification of the API."""
+    return Response(_openapi_json(), media_type="application/json")
+
+
 # override the default settings for the swagger UI
 @app.get(cfg.DOCS_URL, include_in_schema=False)
-def overridden_swagger_docs() -> HTMLResponse:
+async def overridden_swagger_docs() -> HTMLResponse:
     """Override the default swagger UI settings."""
-    return get_swagger_ui_html(
-        openapi_url=cfg.OPENAPI_URL,
-        title=cfg.DOCS_TITLE,
-        swagger_favicon_url=cfg.DOCS_FAVICON_URL
-    )
-
-
-# TODO: expand this middleware to handle every request and response
-@app.middleware("http")
-async def get_current_request(request: Request, call_next: Callable[..., Any]) -> Any:
-    return await call_next(request)
+    return HTMLResponse(_SWAGGER_HTML, headers={"Cache-Control": "public, max-age=3600"})
 
 
 # TODO: Handle exceptions for API and report them to the admin.
 @app.exception_handler(FRoidAPIError)
-async def handle_api_error(_: Request, exc: FRoidAPIError) -> JSONResponse:
+async def handle_api_error(_: Request, exc: FRoidAPIError) -> ORJSONResponse:
     """Handle API errors."""
     # TODO: make specific error messages for each error code
-    return JSONResponse(status_code=exc.code, content=exc.to_dict())
+    return ORJSONResponse(status_code=exc.code, content=exc.to_dict())
 
 
 @app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(_: Request, exc: StarletteHTTPException) -> JSONResponse:
+async def http_exception_handler(_: Request, exc: StarletteHTTPException) -> ORJSONResponse:
     """Handle HTTP exceptions."""
     # dummy handler for now. Maybe we'll add more handlers later.
-    if not isinstance(exc.detail, dict):
-        exc.detail = {"detail": exc.detail}
-    if not exc.detail.get("status"):
-        # The same 'status' key is used in the API error 'to_dict' method.
-        exc.detail["status"] = exc.status_code
-    return JSONResponse(status_code=exc.status_code, content=exc.detail)
+    detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+    # The same 'status' key is used in the API error 'to_dict' method.
+    # build a new payload, the exception's detail may be shared between requests.
+    content = {**detail, "status": detail.get("status") or exc.status_code}
+    # only FastAPI's HTTPException has headers (e.g. 'WWW-Authenticate' for basic auth)
+    return ORJSONResponse(status_code=exc.status_code, content=content, headers=getattr(exc, "headers", None))
 
 
 # handle API parser errors
 @app.exception_handler(ParserError)
-async def handle_parser_error(_: Request, __: ParserError) -> None:
+async def handle_parser_error(_: Request, __: ParserError) -> ORJSONResponse:
     """Handle parser errors."""
-    raise_error(500, message="Internal server error")
-
-
-# TODO: Complete startup and shutdown events
-@app.on_event("startup")
-async def startup_event() -> None:
-    # Initialize the database connection
-    db.init_db()
+    # exception handlers must return a response, raising another error here
+    # would skip the handlers and end up as a plain-text 500 error.
+    return ORJSONResponse(
+        status_code=500,
+        content={"message": "Internal server error", "error": "INTERNAL_SERVER_ERROR", "status": 500}
+    )
 
 
-@app.on_event("shutdown")
-async def shutdown_event() -> None:
-    """Operations to perform when the server shuts down."""
-    # TODO: close database connection and API session for requests
-    await api_handler.close()
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Set up the app's resources on startup and release them on shutdown."""
+    # Creating the database tables is blocking, so don't run it on the event loop
+    await run_in_threadpool(db.init_db)
+    # A single API handler is shared by every request during the app's lifetime
+    app.state.api_handler = FroidAPIHandler(cache_ttl=cfg.API_CACHE_TTL or None)
+    # build the OpenAPI schema now, instead of on the first request for the docs
+    _openapi_json()
+    try:
+        yield
+    finally:
+        await asyncio.gather(app.state.api_handler.close(), close_default_client())
+        db.engine.dispose()
+
+
+# FastAPI 0.71 doesn't accept a 'lifespan' argument yet, so set it on the router.
+app.router.lifespan_context = lifespan
@@ -10,7 +10,7 @@ from api.models import Comment, PostDownloadPage
 from database import utils as db_utils
 from database.db import get_session
 from database.exceptions import TokenNotFoundError
-from .base import api_handler, raise_error
+from .base import FroidAPIHandler, get_api_handler, raise_error
 from .models import PaginatedResult, PostStatistics, SearchItem
 from .utils import decode_html_entities
 
@@ -60,6 +60,18 @@ def get_common_search_queries(
     return {"query": query, "page": page}
 
 
+_STATS_FIELDS: Dict[str, str] = {
+    "post_id": "post_id",
+    "views": "views",
+    "likes": "likes",
+    "total_downloads": "download",
+    "monthly_downloads": "download_month",
+    "weekly_downloads": "download_week",
+    "today_downloads": "download_today",
+}
+"""Fields of :class:`PostStatistics` mapped to the keys of farsroid.com statistics data."""
+
+
 router = APIRouter(
     tags=["Posts"],
     prefix="/posts",
@@ -88,7 +100,7 @@ class CommentsOrderBy(str, Enum):
 @router.get(
     "/search",
     response_model=PaginatedResult,
-    response_model_exclude_unset=True,  # exclude `None` values from the response
+    response_model_exclude_none=True,
     summary="Search for a post on farsroid.com.",
     response_description="The search results.",
     status_code=200
@@ -104,12 +116,14 @@ async def search(
                     "The maximum is 100 results per page."
             ),
             gt=0
-        )
+        ),
+        api_handler: FroidAPIHandler = Depends(get_api_handler)
 ) -> PaginatedResult:
     query, page = common_queries["query"], common_queries["page"]
     res = await api_handler.search(query, page, per_page)
+    # the upstream API returns well-typed data, so skip validating every item
     items = [
-        SearchItem(
+        SearchItem.construct(
             id=item["id"],
             title=decode_html_entities(item["title"]),
             url=item["url"]
@@ -126,12 +140,14 @@ async def search(
 @router.get(
     "/search/legacy",
     response_model=PaginatedResult,
+    response_model_exclude_none=True,
     summary="Search for a post on farsroid.com using the legacy search API.",
     response_description="The search results.",
     status_code=200
 )
 async def legacy_search(
-        common_queries: Dict[str, Any] = Depends(get_common_search_queries)
+        common_queries: Dict[str, Any] = Depends(get_common_search_queries),
+        api_handler: FroidAPIHandler = Depends(get_api_handler)
 ) -> PaginatedResult:
     query, page = common_queries["query"], common_queries["page"]
     items, total_pages = await api_handler.legacy_search(query, page)
@@ -146,6 +162,7 @@ async def legacy_search(
 @router.get(
     "/{post_id}/dp",
     response_model=PostDownloadPage,
+    response_model_exclude_none=True,
     summary="Get a post's download page (dp) by its ID.",
     response_description="The post's download page data.",
     status_code=200
@@ -157,7 +174,8 @@ async def get_post(
             description="The ID of the post to fetch.",
             example=10555,
             gt=0
-        )
+        ),
+        api_handler: FroidAPIHandler = Depends(get_api_handler)
 ) -> PostDownloadPage:
     try:
         return await api_handler.get_post(post_id)
@@ -168,6 +186,7 @@ async def get_post(
 @router.get(
     "/{post_id}/stats",
     response_model=PostStatistics,
+    response_model_exclude_none=True,
     summary="Get statistics for a post stored on farsroid.com database.",
     response_description="The statistics for the post such as downloads, views, etc.",
     status_code=200
@@ -182,31 +201,23 @@ async def get_post_statistics(
             ),
             example=10555,
             gt=0
-        )
+        ),
+        api_handler: FroidAPIHandler = Depends(get_api_handler)
 ) -> PostStatistics:
     try:
-        res = await api_handler.get_post_statistics(post_id)
-        # farsroid API returns 400 if the post is not found!
-    except (BadRequestError, NotFoundError):
-        res = None
-    if not res:
+        data = (await api_handler.get_post_statistics(post_id))["data"][0]
+        # farsroid API returns 400 (or no data) if the post is not found!
+    except (BadRequestError, NotFoundError, IndexError, KeyError, TypeError):
         # TODO: extend the error details (e.g. the post ID, status code, etc.)
         raise_error(404, message=f"post {post_id} not found")
-    data = res["data"][0]
-    return PostStatistics(
-        post_id=data["post_id"],
-        views=data["views"],
-        likes=data["likes"],
-        total_downloads=data["download"],
-        monthly_downloads=data["download_month"],
-        weekly_downloads=data["download_week"],
-        today_downloads=data["download_today"]
-    )
+    # the upstream data is well-typed, so only rename the fields
+    return PostStatistics.construct(**{field: data[key] for field, key in _STATS_FIELDS.items()})
 
 
 @router.get(
     "/{post_id}/comments",
     response_model=List[Comment],
+    response_model_exclude_none=True,
     summary="Get the comments that were made on a post (approved ones).",
     response_description="The list of comments.",
     status_code=200
@@ -253,7 +264,8 @@ async def get_post_comments(
             title="Order By",
             description="The field to order comments by.",
             example="date_gmt"
-        )
+        ),
+        api_handler: FroidAPIHandler = Depends(get_api_handler)
 ) -> List[Comment]:
     # TODO: add pagination and sorting of comments => DONE
     try:
@@ -263,8 +275,9 @@ async def get_post_comments(
             page=page,
             per_page=per_page,
             search=search_,
-            order_by=order_by.value if order_by else None,
-            order=order.value if order else None
+            # str enums are encoded by their values in the query string
+            order_by=order_by,
+            order=order
         )
     except (BadRequestError, NotFoundError):
         raise_error(404, message=f"post {post_id} not found")
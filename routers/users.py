@@ -1,45 +1,170 @@
+from hashlib import sha1
+from threading import Lock
+from typing import AsyncIterator
+
+import orjson
+from api.cache import TTLCache
 from database import models, schemas
 from database import utils as db_utils
-from database.db import get_session
+from database.db import EXTERNAL_POOL, LOCAL_DB, MAX_OVERFLOW, POOL_SIZE, get_session
 from database.exceptions import (
     AuthenticationError,
     OldCredentialsError,
     TokenNotFoundError,
+    UserExistsError,
     UserNotFoundError
 )
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from .base import raise_error
 from .models import UserCredentials
 
+THREADPOOL_SIZE: int = 40
+"""Number of threads running the (synchronous) user endpoints, the default of Starlette (anyio)."""
+MAX_CONCURRENT_REQUESTS: int = (
+    THREADPOOL_SIZE if LOCAL_DB or EXTERNAL_POOL
+    else min(THREADPOOL_SIZE, POOL_SIZE + MAX_OVERFLOW)
+)
+"""Maximum number of requests to the user endpoints handled at the same time (per process).
+For remote databases it matches the connections the worker's pool may open
+(:data:`database.db.POOL_SIZE` + :data:`database.db.MAX_OVERFLOW`), so no request waits
+for a connection. `SQLite` pools and external poolers are limited by the threadpool instead.
+"""
+_active_requests = 0
+
+
+async def limit_concurrency() -> AsyncIterator[None]:
+    """Reject the request with `429` if too many user requests are already in progress.
+
+    Excess requests fail fast instead of waiting in the threadpool and for a database
+    connection until they time out.
+    """
+    global _active_requests
+    if _active_requests >= MAX_CONCURRENT_REQUESTS:
+        raise_error(429, message="Too many requests, please try again later.")
+    _active_requests += 1
+    try:
+        yield
+    finally:
+        _active_requests -= 1
+
+
+USERNAME_CACHE_TTL: float = 30
+"""Number of seconds a taken username is remembered without asking the database again.
+
+The cache is kept per process, a deleted user's username is only forgotten by the worker
+that handled the deletion, the other workers keep rejecting it for up to this long.
+"""
+# only taken usernames are cached, a cached "free" username could be registered by another
+# worker in the meantime. Endpoints run in the threadpool, so the cache is guarded by a lock.
+_taken_usernames = TTLCache(USERNAME_CACHE_TTL, maxsize=10000)
+_taken_usernames_lock = Lock()
+
+
+def username_taken(username: str) -> bool:
+    """Check whether a username is known to be registered, without asking the database."""
+    with _taken_usernames_lock:
+        return bool(_taken_usernames.get(username))
+
+
+def remember_username(username: str) -> None:
+    """Remember that a username is registered for :data:`USERNAME_CACHE_TTL` seconds."""
+    with _taken_usernames_lock:
+        _taken_usernames.set(username, True)
+
+
+# Request body parameters of the endpoints
+_CRED_BODY = Body(
+    ...,
+    title="User Credentials",
+    description="User credentials for authentication.",
+    example={"username": "Reza", "password": "some_strong_password"}
+)
+_USER_CREATE_BODY = Body(
+    ...,
+    title="User registration data",
+    description="The data to register a new user. "
+)
+_WITH_TOKEN_QUERY = Query(
+    False,
+    title="With token",
+    description=(
+        "Whether to create a token for the new user as well. "
+        "The user and the token are saved together and both are returned."
+    )
+)
+_NEW_PASSWORD_BODY = Body(
+    ...,
+    title="New password",
+    description=(
+        "The new password for the user. "
+        "Must be at least 8 characters long and "
+        "different from the old password."
+    ),
+    example="new_pass_8000",
+    min_length=8
+)
+
+
 # TODO: exclude user endpoints from docs
 router = APIRouter(
     tags=["Users"],
     prefix="/users",
+    dependencies=[Depends(limit_concurrency)],
     responses={
         204: {"description": "No content, operation successful."},
         401: {"description": "Unauthorized, invalid credentials."},
+        429: {"description": "Too many requests, the server is busy."},
     }
 )
 
 
 def get_user_cred(
-    user: UserCredentials = Body(
-        ...,
-        title="User Credentials",
-        description="User credentials for authentication.",
-        example={"username": "Reza", "password": "some_strong_password"}
-    )
+    user: UserCredentials = _CRED_BODY
 ) -> UserCredentials:
     """Return the user credentials from the request."""
     return user
 
 
-def user_auth_handler(db: Session, user: UserCredentials) -> models.User:
-    """Authenticate a user by username and password and return the user."""
+basic_auth = HTTPBasic(
+    description="The username and password of the user (for the `GET` endpoints)."
+)
+
+
+def get_basic_user_cred(credentials: HTTPBasicCredentials = Depends(basic_auth)) -> UserCredentials:
+    """Return the user credentials from the `Authorization` header of the request."""
+    # the credentials are checked against the database, so they're not validated again
+    return UserCredentials.construct(username=credentials.username, password=credentials.password)
+
+
+def conditional_response(request: Request, model: BaseModel) -> Response:
+    """Return the model as `JSON` with an `ETag`, or `304 Not Modified` if the client's copy is current.
+
+    The `ETag` is a hash of the response body, so it changes whenever the returned
+    data changes (e.g. the password or the token of the user).
+    """
+    body = orjson.dumps(model.dict())
+    etag = f'"{sha1(body).hexdigest()}"'
+    # the responses are personal, so shared caches must not store them and clients
+    # must revalidate their copy before using it.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def user_auth_handler(db: Session, user: UserCredentials, for_update: bool = False) -> models.User:
+    """Authenticate a user by username and password and return the user.
+
+    Set `for_update` when the user is going to be changed, its row is locked
+    from the authentication until the change is committed.
+    """
     try:
-        db_user = db_utils.authenticate_user(db, user.username, user.password)
+        db_user = db_utils.authenticate_user(db, user.username, user.password, for_update)
     except AuthenticationError as e:
         raise_error(401, message=str(e))
     except UserNotFoundError as e:
@@ -58,17 +183,21 @@ def user_auth_handler(db: Session, user: UserCredentials) -> models.User:
     status_code=201
 )
 def register_user(
-    user: schemas.UserCreate = Body(
-        ...,
-        title="User registration data",
-        description="The data to register a new user. "
-    ),
+    user: schemas.UserCreate = _USER_CREATE_BODY,
+    with_token: bool = _WITH_TOKEN_QUERY,
     db: "Session" = Depends(get_session)
 ) -> models.User:
-    db_user = db_utils.get_user_by_username(db, user.username)
-    if db_user:
+    if username_taken(user.username):
         raise_error(400, message="User with this username already exists.")
-    return db_utils.save_user(db, user)
+    save = db_utils.save_user_with_token if with_token else db_utils.save_user
+    try:
+        db_user = save(db, user)
+    except UserExistsError as e:
+        if e.field == "username":
+            remember_username(user.username)
+        raise_error(400, message=str(e))
+    remember_username(db_user.username)
+    return db_user
 
 
 @router.post(
@@ -85,6 +214,23 @@ def get_me(
     return user_auth_handler(db, user)
 
 
+@router.get(
+    "/me",
+    response_model=schemas.RegisteredUser,
+    summary="Get user's profile (supports conditional requests)",
+    response_description="The user's profile data.",
+    responses={304: {"description": "Not modified, the cached profile is still current."}},
+    status_code=200
+)
+def get_me_cached(
+    request: Request,
+    user: UserCredentials = Depends(get_basic_user_cred),
+    db: "Session" = Depends(get_session)
+) -> Response:
+    db_user = user_auth_handler(db, user)
+    return conditional_response(request, schemas.RegisteredUser.from_orm(db_user))
+
+
 @router.delete(
     "/me",
     response_model=None,
@@ -95,8 +241,10 @@ def delete_me(
     user: UserCredentials = Depends(get_user_cred),
     db: "Session" = Depends(get_session)
 ) -> None:
-    db_user = user_auth_handler(db, user)
+    db_user = user_auth_handler(db, user, for_update=True)
     db_utils.delete_user(db, db_user)
+    with _taken_usernames_lock:
+        _taken_usernames.pop(db_user.username)
 
 
 @router.put(
@@ -107,21 +255,11 @@ def delete_me(
     status_code=200
 )
 def update_me(
-    new_password: str = Body(
-        ...,
-        title="New password",
-        description=(
-            "The new password for the user. "
-            "Must be at least 8 characters long and "
-            "different from the old password."
-        ),
-        example="new_pass_8000",
-        min_length=8
-    ),
+    new_password: str = _NEW_PASSWORD_BODY,
     user: UserCredentials = Depends(get_user_cred),
     db: "Session" = Depends(get_session)
 ) -> models.User:
-    db_user = user_auth_handler(db, user)
+    db_user = user_auth_handler(db, user, for_update=True)
     try:
         return db_utils.update_user_password(db, db_user, new_password)
     except OldCredentialsError as e:
@@ -146,6 +284,25 @@ def get_token(
     return db_user.token
 
 
+@router.get(
+    "/me/token",
+    response_model=schemas.UserToken,
+    summary="Get user's token (supports conditional requests)",
+    response_description="The user's token data.",
+    responses={304: {"description": "Not modified, the cached token is still current."}},
+    status_code=200
+)
+def get_token_cached(
+    request: Request,
+    user: UserCredentials = Depends(get_basic_user_cred),
+    db: "Session" = Depends(get_session)
+) -> Response:
+    db_user = user_auth_handler(db, user)
+    if not db_user.token:
+        raise_error(404, message=f"User {user.username!r} has no token.")
+    return conditional_response(request, schemas.UserToken.from_orm(db_user.token))
+
+
 # create a token for the user
 @router.post(
     "/me/token/new",
@@ -175,7 +332,7 @@ def revoke_token(
     user: UserCredentials = Depends(get_user_cred),
     db: "Session" = Depends(get_session)
 ) -> None:
-    db_user = user_auth_handler(db, user)
+    db_user = user_auth_handler(db, user, for_update=True)
     try:
         db_utils.revoke_token(db, db_user)
     except TokenNotFoundError:
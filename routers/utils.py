@@ -1,14 +1,13 @@
-from lxml import html as html_parser
+from html import unescape
 
 
-# A HTML parser for decoding HTML entities like '&#x27' using lxml.
 def decode_html_entities(html: str) -> str:
-    """Decode HTML entities like `&#x27` using lxml.
+    """Decode HTML entities like `&#x27` in a text.
     
     Parameters:
-        html (`str`): The HTML to decode.
+        html (`str`): The text to decode.
     
     Returns:
-        `str`: The decoded HTML.
+        `str`: The decoded text.
     """
-    return html_parser.fromstring(html).text_content()
+    return unescape(html)